@@ -1,15 +1,49 @@
+import hashlib
+import httpx
 import json
+import litellm
+import orjson
 import phoenix as px
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from datetime import datetime
 import os
 import sys
 import argparse
+import asyncio
+import csv
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import nest_asyncio
+from diskcache import Cache
 from dotenv import load_dotenv
 
-# Fix for nested asyncio in notebooks/scripts
-nest_asyncio.apply()
+try:
+    # blake3's vectorized compression hashes the long rendered prompts
+    # several times faster than sha256. Optional: the stdlib fallback
+    # produces equally valid cache keys, just more slowly. Whichever is
+    # active determines the key space, so installing/removing blake3
+    # starts the response cache cold.
+    from blake3 import blake3 as _content_hash
+except ImportError:
+    _content_hash = hashlib.sha256
+
+
+def _running_in_notebook():
+    """True when running under IPython/Jupyter, where an event loop already exists."""
+    try:
+        get_ipython()  # noqa: F821 - injected by IPython at runtime
+        return True
+    except NameError:
+        return False
+
+
+# Fix for nested asyncio in notebooks. The patch makes the loop re-entrant but
+# adds scheduling checks to every await; as a CLI there is no outer loop to
+# nest inside, so only apply it when an IPython kernel is hosting us.
+if _running_in_notebook():
+    nest_asyncio.apply()
 
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,78 +55,137 @@ load_dotenv(os.path.join(PROJECT_ROOT, ".env"), override=True)
 DEFAULT_CAPSULES_PATH = os.path.join(BASE_DIR, "../samples/calculator/public/capsules.json")
 
 
-def load_data(capsules_path):
-    """Loads capsules.json and converts it to a format suitable for Phoenix."""
+@functools.lru_cache(maxsize=4)
+def _parse_capsules(capsules_path, mtime_ns, size):
+    """Parses capsules.json, memoized on the file's identity and stat signature.
+
+    The mtime/size key means repeated calls in one session (e.g. a notebook
+    iterating on prompts) skip the read and orjson parse entirely, while a
+    regenerated capsules.json changes the key and reparses automatically.
+    """
+    with open(capsules_path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def _read_capsules(capsules_path):
+    """Reads and parses capsules.json once; both loaders share the result.
+
+    orjson's C parser decodes the file in one pass, and parsing here instead
+    of inside each loader halves the file I/O and JSON-decode cost per run.
+    """
     try:
         if not os.path.exists(capsules_path):
             print(f"Error: {capsules_path} not found. Please run the agent first.")
             return None
 
-        with open(capsules_path, "r") as f:
-            data = json.load(f)
-        
-        records = []
+        st = os.stat(capsules_path)
+        return _parse_capsules(capsules_path, st.st_mtime_ns, st.st_size)
+
+    except Exception as e:
+        print(f"Failed to read {capsules_path}: {e}")
+        return None
+
+
+def load_data(data):
+    """Converts parsed capsules data to a format suitable for Phoenix."""
+    try:
+        if data is None:
+            return None
+
+        # The input payload is compact, key-sorted JSON: indentation only adds
+        # whitespace tokens to every LLM call, and deterministic key order
+        # keeps the rendered prompts byte-stable across runs for the response
+        # and prompt-prefix caches.
+        # Columnar construction: one list per column handed straight to the
+        # DataFrame constructor. from_records would re-key every row dict and
+        # run dtype inference per cell; a dict of lists skips both passes.
+        # Only capsules with an upperLevelSummary (the AI-generated summary)
+        # are kept. Metadata-only capsules used to get a row with an empty
+        # output; skipping them before any per-row work saves the orjson
+        # encode here and every downstream stage (evals, stats, Phoenix)
+        # a row it could only ignore. has_summary is therefore always True
+        # now but stays a column: downstream filters and the Phoenix schema
+        # reference it.
+        cols = {
+            "id": [], "input": [], "output": [], "language": [],
+            "name": [], "has_summary": [], "prompt_version": [],
+        }
         for file_path, capsule in data.get("files", {}).items():
-            # Check for upperLevelSummary (the AI-generated summary)
-            if capsule.get("upperLevelSummary") or capsule.get("metadata"):
-                metadata = capsule.get("metadata", {})
-                record = {
-                    "id": file_path,
-                    "input": json.dumps({
-                        "relativePath": capsule.get("relativePath"),
-                        "lang": capsule.get("lang"),
-                        "exports": [e.get("name") for e in capsule.get("exports", [])],
-                        "functionSignatures": [s.get("signature") for s in metadata.get("functionSignatures", [])],
-                        "firstNLines": metadata.get("firstNLines", "")[:500],
-                    }, indent=2),
-                    "output": capsule.get("upperLevelSummary", ""),
-                    "language": capsule.get("lang"),
-                    "name": capsule.get("name"),
-                    "has_summary": bool(capsule.get("upperLevelSummary")),
-                    "prompt_version": capsule.get("upperLevelSummaryVersion", "v1_balanced")
-                }
-                records.append(record)
-        
-        return pd.DataFrame(records)
+            if not capsule.get("upperLevelSummary"):
+                continue
+            cols["id"].append(file_path)
+            cols["input"].append(orjson.dumps({
+                "relativePath": capsule.get("relativePath"),
+                "lang": capsule.get("lang"),
+                "exports": [e.get("name") for e in capsule.get("exports", [])],
+                "functionSignatures": [s.get("signature") for s in capsule.get("metadata", {}).get("functionSignatures", [])],
+                "firstNLines": capsule.get("metadata", {}).get("firstNLines", "")[:500],
+            }, option=orjson.OPT_SORT_KEYS).decode())
+            cols["output"].append(capsule.get("upperLevelSummary", ""))
+            cols["language"].append(capsule.get("lang"))
+            cols["name"].append(capsule.get("name"))
+            cols["has_summary"].append(bool(capsule.get("upperLevelSummary")))
+            cols["prompt_version"].append(capsule.get("upperLevelSummaryVersion", "v1_balanced"))
+
+        # Arrow-backed strings store the long input/output texts in contiguous
+        # buffers instead of one Python object per cell, halving memory and
+        # making the pyarrow CSV/Parquet writes zero-copy.
+        return pd.DataFrame(cols, copy=False).astype({
+            "id": "string[pyarrow]",
+            "input": "string[pyarrow]",
+            "output": "string[pyarrow]",
+            "language": "category",
+            "name": "category",
+            "has_summary": "bool",
+            "prompt_version": "string[pyarrow]",
+        })
 
     except Exception as e:
         print(f"Failed to load data: {e}")
         return None
 
 
-def load_lower_level_data(capsules_path):
-    """Loads lower-level (deep) analysis data from capsules.json."""
+def load_lower_level_data(data):
+    """Loads lower-level (deep) analysis data from parsed capsules data."""
     try:
-        if not os.path.exists(capsules_path):
-            print(f"Error: {capsules_path} not found.")
+        if data is None:
             return None
 
-        with open(capsules_path, "r") as f:
-            data = json.load(f)
-        
-        records = []
+        # Same columnar construction as load_data: per-column lists into the
+        # DataFrame constructor, compact orjson payloads. num_blocks arrives
+        # as a clean int list, so pandas gives it an int64 column directly
+        # instead of falling back to object dtype. Only files that have
+        # lower-level analysis are included; structure_json is a stored
+        # artifact, not prompt input, but compact encoding still shrinks it
+        # on disk and in memory.
+        cols = {
+            "id": [], "input": [], "output": [], "language": [], "name": [],
+            "num_blocks": [], "structure_json": [], "prompt_version": [],
+        }
         for file_path, capsule in data.get("files", {}).items():
-            # Only include files that have lower-level analysis
-            if capsule.get("lowerLevelSummary"):
-                structure = capsule.get("structure", [])
-                record = {
-                    "id": file_path,
-                    "input": json.dumps({
-                        "relativePath": capsule.get("relativePath"),
-                        "lang": capsule.get("lang"),
-                        "exports": [e.get("name") for e in capsule.get("exports", [])],
-                        "imports": [i.get("pathOrModule") for i in capsule.get("imports", [])],
-                    }, indent=2),
-                    "output": capsule.get("lowerLevelSummary", ""),
-                    "language": capsule.get("lang"),
-                    "name": capsule.get("name"),
-                    "num_blocks": len(structure),
-                    "structure_json": json.dumps(structure, indent=2) if structure else "",
-                    "prompt_version": capsule.get("lowerLevelSummaryVersion", "v1_structured")
-                }
-                records.append(record)
-        
-        return pd.DataFrame(records)
+            if not capsule.get("lowerLevelSummary"):
+                continue
+            cols["id"].append(file_path)
+            cols["input"].append(orjson.dumps({
+                "relativePath": capsule.get("relativePath"),
+                "lang": capsule.get("lang"),
+                "exports": [e.get("name") for e in capsule.get("exports", [])],
+                "imports": [i.get("pathOrModule") for i in capsule.get("imports", [])],
+            }, option=orjson.OPT_SORT_KEYS).decode())
+            cols["output"].append(capsule.get("lowerLevelSummary", ""))
+            cols["language"].append(capsule.get("lang"))
+            cols["name"].append(capsule.get("name"))
+            cols["num_blocks"].append(len(capsule.get("structure", [])))
+            cols["structure_json"].append(orjson.dumps(capsule["structure"]).decode() if capsule.get("structure") else "")
+            cols["prompt_version"].append(capsule.get("lowerLevelSummaryVersion", "v1_structured"))
+
+        return pd.DataFrame(cols, copy=False).astype({
+            "id": "string[pyarrow]",
+            "input": "string[pyarrow]",
+            "output": "string[pyarrow]",
+            "structure_json": "string[pyarrow]",
+            "prompt_version": "string[pyarrow]",
+        })
 
     except Exception as e:
         print(f"Failed to load lower-level data: {e}")
@@ -110,173 +203,423 @@ from phoenix.evals.legacy import (
 )
 from phoenix.evals.models import LiteLLMModel
 
-# ...
-
-def run_evaluations(df):
-    """Runs LLM-based evaluations on the data."""
-    print("🧠 Running AI Evaluations...")
-    
-    # Configure Gemini model via LiteLLM
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("⚠️ GEMINI_API_KEY not set. Skipping evaluations.")
-        return None
-
-    # Use a Gemini model supported by LiteLLM
-    model = LiteLLMModel(
-        model="gemini/gemini-2.0-flash",
-    )
-
-    # 1. Clarity Evaluator (Score 1-5)
-    # We use ClassificationTemplate because LLMEvaluator expects the template 
-    # to support 'extract_label_from_explanation' for parsing results.
-    clarity_template = ClassificationTemplate(
-        rails=["1", "2", "3", "4", "5"],
-        template="""
+# On-disk response cache for evaluator calls. Keyed by a content hash of the
+# model name plus the fully rendered prompt (which embeds both the template text and
+# the row's input/output), so unchanged rows skip the network entirely on
+# re-runs and editing a template automatically invalidates its entries.
+EVAL_CACHE_DIR = os.path.join(BASE_DIR, ".eval_cache")
+_eval_cache = Cache(EVAL_CACHE_DIR)
+
+
+def _cache_key(model_name, prompt):
+    return _content_hash(f"{model_name}|{prompt}".encode()).hexdigest()
+
+
+class CachedLiteLLMModel(LiteLLMModel):
+    """LiteLLMModel with an exact-match on-disk response cache."""
+
+    def _generate(self, prompt, **kwargs):
+        key = _cache_key(self.model, str(prompt))
+        if key in _eval_cache:
+            return _eval_cache[key]
+        result = super()._generate(prompt, **kwargs)
+        _eval_cache[key] = result
+        return result
+
+    async def _async_generate(self, prompt, **kwargs):
+        key = _cache_key(self.model, str(prompt))
+        if key in _eval_cache:
+            return _eval_cache[key]
+        result = await super()._async_generate(prompt, **kwargs)
+        _eval_cache[key] = result
+        return result
+
+# Invariant prompt templates, built once at import time instead of on every
+# run_evaluations / run_lower_level_evaluations invocation.
+
+# Fused upper-level evaluator prompt: one Gemini call per row returns clarity,
+# verbosity and completeness together as JSON, so the large {input} context is
+# sent once instead of three times — 3x fewer calls and roughly 3x less
+# input-token cost than separate evaluators. The full static instruction block
+# (rubrics + JSON schema) sits before the per-row data, so it forms a
+# byte-stable prefix across all N calls that Gemini's implicit prompt-prefix
+# cache can reuse.
+_FUSED_RUBRIC = """
         You are an expert code documentation reviewer.
-        Evaluate the clarity of the following code summary.
-        
-        Input Context: {input}
-        Generated Summary: {output}
-        
-        Rate the clarity on a scale of 1-5:
+        Evaluate each code summary given after the delimiter on three axes.
+
+        1. clarity — rate on a scale of 1-5:
         1: Completely unclear or irrelevant.
         5: Perfectly clear, concise, and accurate describing the code.
-        
-        Provide a brief explanation for your score.
-        """
-    )
-    
-    # 2. Verbosity Evaluator (Categorical)
-    verbosity_template = ClassificationTemplate(
-        rails=["Too Short", "Good", "Too Long"],
-        template="""
-        Evaluate the verbosity of the generated summary for the given code context.
-        
-        Input Context: {input}
-        Generated Summary: {output}
-        
-        Classify as:
+
+        2. verbosity — classify as one of:
         - 'Too Short': Misses key details.
         - 'Good': Just right.
         - 'Too Long': Too wordy or redundant.
-        """
-    )
 
-    # 3. Completeness Evaluator (Score 1-5)
-    # Checks if the summary mentions key functions/classes found in the code.
-    completeness_template = ClassificationTemplate(
-        rails=["1", "2", "3", "4", "5"],
-        template="""
-        You are an expert code reviewer.
-        Evaluate the completeness of the following code summary.
-        
-        Input Context: {input}
-        Generated Summary: {output}
-        
-        Rate the completeness on a scale of 1-5:
+        3. completeness — rate on a scale of 1-5:
         1: Misses the main purpose and key components.
         3: Covers the main purpose but misses some important details.
         5: Comprehensively covers the purpose, key functions, and behavior.
-        
-        Provide a brief explanation for your score.
-        """
-    )
 
-    # Run evaluations
-    # Using legacy LLMEvaluator which takes (model, template)
-    # The order of results matches this list.
-    evaluators = [
-        LLMEvaluator(
-            model=model,
-            template=clarity_template
-        ),
-        LLMEvaluator(
-            model=model,
-            template=verbosity_template
-        ),
-        LLMEvaluator(
-            model=model,
-            template=completeness_template
-        )
-    ]
+        For every summary produce a JSON evaluation object of the form:
+        {{"clarity": <1-5>, "clarity_explanation": "<brief explanation>",
+          "verbosity": "<Too Short|Good|Too Long>", "verbosity_explanation": "<brief explanation>",
+          "completeness": <1-5>, "completeness_explanation": "<brief explanation>"}}
+"""
 
-    try:
-        results = run_evals(
-            dataframe=df,
-            evaluators=evaluators,
-            provide_explanation=True
-        )
-        print("✅ Evaluations complete!")
-        return results
-    except Exception as e:
-        print(f"❌ Evaluation failed: {e}")
-        return None
+FUSED_EVAL_TEMPLATE = _FUSED_RUBRIC + """
+        Respond with that single JSON object and nothing else.
 
+        --- DATA TO EVALUATE ---
+        Input Context: {input}
+        Generated Summary: {output}
+        """
 
-def run_lower_level_evaluations(df):
-    """Runs LLM-based evaluations on lower-level (deep) analysis data."""
-    print("🧠 Running Lower-Level AI Evaluations...")
-    
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("⚠️ GEMINI_API_KEY not set. Skipping lower-level evaluations.")
-        return None
+# Batched variant: several rows ride in one request, amortizing the network
+# round-trip and per-request overhead that dominate at small row sizes.
+FUSED_BATCH_TEMPLATE = _FUSED_RUBRIC + """
+        You will receive {n} numbered entries. Evaluate each entry
+        independently and respond with a single JSON object mapping each
+        entry number to its evaluation object, e.g.
+        {{"1": {{...}}, "2": {{...}}}}, and nothing else.
 
-    model = LiteLLMModel(
-        model="gemini/gemini-2.0-flash",
-    )
+        --- DATA TO EVALUATE ---
+        {entries}
+        """
 
-    # 1. Detail Score (1-5) - Does it describe algorithms and implementation details?
-    detail_template = ClassificationTemplate(
-        rails=["1", "2", "3", "4", "5"],
-        template="""
+# Lower-level (deep analysis) evaluators. Static rubric first, per-row data
+# after the delimiter, for the same prefix-caching reason as above.
+
+# 1. Detail Score (1-5) - Does it describe algorithms and implementation details?
+DETAIL_TEMPLATE = ClassificationTemplate(
+    rails=["1", "2", "3", "4", "5"],
+    template="""
         You are an expert code documentation reviewer.
-        Evaluate the DETAIL level of the following deep file analysis.
-        
-        File Metadata: {input}
-        Deep Analysis Summary: {output}
-        
+        Evaluate the DETAIL level of the deep file analysis given after the delimiter.
+
         Rate the detail level on a scale of 1-5:
         1: Very shallow, no implementation details.
         3: Mentions some algorithms or patterns but lacks depth.
         5: Comprehensive, describes algorithms, data flow, and key implementation details.
-        
+
         Provide a brief explanation for your score.
-        """
-    )
-    
-    # 2. Structure Accuracy (1-5) - Does the structure array seem plausible?
-    # We pass the structure JSON as part of the input for this check
-    accuracy_template = ClassificationTemplate(
-        rails=["1", "2", "3", "4", "5"],
-        template="""
-        You are an expert code analyst.
-        Evaluate whether the structure breakdown is ACCURATE for this file.
-        
+
+        --- DATA TO EVALUATE ---
         File Metadata: {input}
         Deep Analysis Summary: {output}
-        
+        """
+)
+
+# 2. Structure Accuracy (1-5) - Does the structure array seem plausible?
+# We pass the structure JSON as part of the input for this check
+ACCURACY_TEMPLATE = ClassificationTemplate(
+    rails=["1", "2", "3", "4", "5"],
+    template="""
+        You are an expert code analyst.
+        Evaluate whether the structure breakdown is ACCURATE for the file given after the delimiter.
+
         Rate the accuracy on a scale of 1-5:
         1: Structure is clearly wrong or nonsensical.
         3: Structure is mostly correct but has some issues.
         5: Structure accurately reflects the file's organization.
-        
+
         Provide a brief explanation for your score.
+
+        --- DATA TO EVALUATE ---
+        File Metadata: {input}
+        Deep Analysis Summary: {output}
         """
+)
+
+def _compile_renderer(template):
+    """Compiles an {input}/{output} template into a direct f-string renderer.
+
+    str.format re-parses the placeholder mini-language on every call; exec-ing
+    a def whose body is the template as an f-string literal turns each render
+    into plain string concatenation, several times faster per call. The
+    template's {{...}} escapes mean the same thing in an f-string as they do
+    to str.format, so the text embeds unchanged.
+    """
+    source = 'def _render(input, output):\n    return f"""' + template + '"""'
+    namespace = {}
+    exec(compile(source, "<eval-template>", "exec"), namespace)
+    return namespace["_render"]
+
+
+# Prebound renderer for the fused prompt, compiled once at import time.
+_render_fused_prompt = _compile_renderer(FUSED_EVAL_TEMPLATE)
+
+# Stable per-template ids, precomputed once for use as cache-key prefixes.
+TEMPLATE_HASHES = {
+    "fused": _content_hash(FUSED_EVAL_TEMPLATE.encode()).hexdigest(),
+    "fused_batch": _content_hash(FUSED_BATCH_TEMPLATE.encode()).hexdigest(),
+    "detail": _content_hash(DETAIL_TEMPLATE.template.encode()).hexdigest(),
+    "accuracy": _content_hash(ACCURACY_TEMPLATE.template.encode()).hexdigest(),
+}
+
+
+@functools.lru_cache(maxsize=2)
+def _get_model(json_mode=False):
+    """Builds the shared Gemini model once per mode (LiteLLM init is not free).
+
+    Returns None when GEMINI_API_KEY is unset, so callers can skip evaluations;
+    the env check still runs on first call rather than at import time.
+    """
+    if not os.getenv("GEMINI_API_KEY"):
+        return None
+    # Both model instances route through litellm's module-level client, so a
+    # pooled session here means the upper- and lower-level eval passes reuse
+    # keep-alive TLS connections to Gemini instead of re-handshaking.
+    if litellm.client_session is None:
+        litellm.client_session = httpx.Client(
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    model_kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+    return CachedLiteLLMModel(
+        model="gemini/gemini-2.0-flash",
+        model_kwargs=model_kwargs,
     )
 
+
+def _run_evaluators_concurrently(df, evaluators):
+    """Runs each evaluator as its own run_evals pass, all passes in parallel.
+
+    The passes are independent, I/O-bound LLM fan-outs over the same rows, so
+    dispatching them together collapses the (num_evaluators x N)-serial latency
+    profile to roughly a single pass. Returns one result DataFrame per
+    evaluator, in the same order as `evaluators` (matching run_evals).
+    """
+
+    async def _run_all():
+        passes = [
+            asyncio.to_thread(
+                run_evals,
+                dataframe=df,
+                evaluators=[evaluator],
+                provide_explanation=True,
+                concurrency=EVAL_CONCURRENCY,
+            )
+            for evaluator in evaluators
+        ]
+        return await asyncio.gather(*passes)
+
+    return [result[0] for result in asyncio.run(_run_all())]
+
+
+def _write_csv(df, path):
+    """Writes a DataFrame to CSV via pyarrow's C++ writer.
+
+    pandas' own to_csv serializes cell-by-cell in Python, which is the
+    second-slowest step after the LLM calls for wide string-heavy frames.
+    """
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), path)
+
+
+def _settle_writes(futures):
+    """Blocks until the background artifact writes finish.
+
+    result() re-raises any exception from the worker, so a failed write
+    (missing codec, full disk) aborts the run loudly instead of letting it
+    report success over a half-written artifact.
+    """
+    for future in futures:
+        future.result()
+
+
+def _append_history_row(path, record):
+    """Appends one record to a history CSV, writing the header on first use.
+
+    A one-row DataFrame plus to_csv(mode='a') drags full pandas machinery
+    (construction, dtype inference, index handling) into a few-field append;
+    a plain csv.writer line is all that's needed.
+    """
+    new_file = not os.path.exists(path)
+    with open(path, "a", buffering=1 << 16, newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(record.keys())
+        writer.writerow(record.values())
+
+
+# Gemini rate-limit handling for the fused fan-out: cap in-flight requests
+# below the QPM ceiling and retry transient failures (429s, flaky HTTP) with
+# exponential backoff instead of letting one error sink the whole pass.
+EVAL_CONCURRENCY = 50
+EVAL_BATCH_SIZE = 16
+EVAL_MAX_ATTEMPTS = 3
+EVAL_BACKOFF_BASE_SECONDS = 1.0
+EVAL_BACKOFF_MAX_SECONDS = 30.0
+
+
+async def _call_with_backoff(model, prompt, semaphore):
+    """Calls the model under the shared semaphore, retrying with backoff."""
+    async with semaphore:
+        for attempt in range(1, EVAL_MAX_ATTEMPTS + 1):
+            try:
+                return await asyncio.to_thread(model, prompt)
+            except Exception as e:
+                if attempt == EVAL_MAX_ATTEMPTS:
+                    raise
+                delay = min(EVAL_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), EVAL_BACKOFF_MAX_SECONDS)
+                print(f"⚠️ LLM call failed ({e}); retrying in {delay:.0f}s...")
+                await asyncio.sleep(delay)
+
+
+def _fused_row_cache_key(row_input, row_output):
+    """Cache key for one parsed fused evaluation, invariant to batching."""
+    return _content_hash(f"{TEMPLATE_HASHES['fused']}|{row_input}|{row_output}".encode()).hexdigest()
+
+
+def _render_batch_prompt(batch_pairs):
+    """Renders one batched prompt from up to EVAL_BATCH_SIZE (input, output) pairs."""
+    entries = "\n".join(
+        f"Entry {i}:\nInput Context: {row_input}\nGenerated Summary: {row_output}\n"
+        for i, (row_input, row_output) in enumerate(batch_pairs, start=1)
+    )
+    return FUSED_BATCH_TEMPLATE.format(n=len(batch_pairs), entries=entries)
+
+
+def _parse_fused_response(response):
+    """Parses a fused-evaluator JSON response, tolerating markdown code fences."""
+    text = str(response).strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.startswith("json"):
+            text = text[len("json"):].strip()
+    try:
+        parsed = json.loads(text)
+        return parsed if isinstance(parsed, dict) else {}
+    except (json.JSONDecodeError, ValueError):
+        return {}
+
+
+def _parse_batch_response(response, expected):
+    """Parses a batched response into one dict per entry, or None on failure."""
+    parsed = _parse_fused_response(response)
+    if not parsed:
+        return None
+    entries = [parsed.get(str(i)) for i in range(1, expected + 1)]
+    if any(not isinstance(entry, dict) for entry in entries):
+        return None
+    return entries
+
+
+async def _evaluate_batch(model, batch_pairs, semaphore):
+    """Evaluates a batch of rows in one LLM call, falling back to per-row calls.
+
+    Packing rows amortizes the per-request round-trip; if the batched
+    response doesn't parse into one entry per row, the batch is retried as
+    individual fused calls so a single malformed reply can't lose 16 rows.
+    """
+    if len(batch_pairs) == 1:
+        response = await _call_with_backoff(model, _render_fused_prompt(*batch_pairs[0]), semaphore)
+        return [_parse_fused_response(response)]
+
+    response = await _call_with_backoff(model, _render_batch_prompt(batch_pairs), semaphore)
+    entries = _parse_batch_response(response, len(batch_pairs))
+    if entries is not None:
+        return entries
+
+    print(f"⚠️ Batched response unparseable; re-evaluating {len(batch_pairs)} rows individually.")
+    responses = await asyncio.gather(*[
+        _call_with_backoff(model, _render_fused_prompt(row_input, row_output), semaphore)
+        for row_input, row_output in batch_pairs
+    ])
+    return [_parse_fused_response(response) for response in responses]
+
+
+def run_evaluations(df):
+    """Runs LLM-based evaluations on the data."""
+    print("🧠 Running AI Evaluations...")
+    
+    model = _get_model(json_mode=True)
+    if model is None:
+        print("⚠️ GEMINI_API_KEY not set. Skipping evaluations.")
+        return None
+
+    # Rows without a summary would only earn guaranteed bottom ratings, yet
+    # each still cost an LLM call. Evaluate only the rows that have one and
+    # leave the rest as NaN via reindex below.
+    eval_df = df[df["has_summary"]] if "has_summary" in df.columns else df
+    if len(eval_df) < len(df):
+        print(f"⏭️ Skipping {len(df) - len(eval_df)} rows without a summary.")
+
+    # Capsules can carry identical (input, output) pairs — e.g. re-summaries
+    # of the same file. Dispatch one call per unique pair and broadcast the
+    # parsed result back to every duplicate row.
+    pairs = list(zip(eval_df["input"], eval_df["output"]))
+    unique_pairs = list(dict.fromkeys(pairs))
+    if len(unique_pairs) < len(pairs):
+        print(f"🔁 Deduplicated {len(pairs) - len(unique_pairs)} rows with identical input/output.")
+
+    # Row-level memoization on top of the model-level response cache: batch
+    # prompts cache as whole 16-row blobs there, so one changed capsule would
+    # miss for its entire batch. Parsed per-row results are cached under a
+    # template-hash + content key instead, and only the misses are batched.
+    parsed_by_pair = {}
+    missing_pairs = []
+    for pair in unique_pairs:
+        cached = _eval_cache.get(_fused_row_cache_key(*pair))
+        if cached is not None:
+            parsed_by_pair[pair] = cached
+        else:
+            missing_pairs.append(pair)
+    if parsed_by_pair:
+        print(f"♻️ {len(parsed_by_pair)} rows served from the eval cache.")
+
+    try:
+        async def _evaluate_unique_rows():
+            semaphore = asyncio.Semaphore(EVAL_CONCURRENCY)
+            batches = [
+                missing_pairs[i:i + EVAL_BATCH_SIZE]
+                for i in range(0, len(missing_pairs), EVAL_BATCH_SIZE)
+            ]
+            batch_results = await asyncio.gather(*[
+                _evaluate_batch(model, batch, semaphore) for batch in batches
+            ])
+            return [entry for batch in batch_results for entry in batch]
+
+        for pair, entry in zip(missing_pairs, asyncio.run(_evaluate_unique_rows())):
+            parsed_by_pair[pair] = entry
+            if entry:  # don't memoize parse failures
+                _eval_cache[_fused_row_cache_key(*pair)] = entry
+        parsed = [parsed_by_pair[pair] for pair in pairs]
+
+        # Split the fused responses back into three result DataFrames shaped
+        # like run_evals output (label/explanation columns, same index), so
+        # the downstream rename/join code in main() is unchanged. reindex
+        # aligns back to the full frame, NaN-filling the skipped rows.
+        results = [
+            pd.DataFrame({
+                "label": [p.get(metric) for p in parsed],
+                "explanation": [p.get(f"{metric}_explanation") for p in parsed],
+            }, index=eval_df.index).reindex(df.index)
+            for metric in ("clarity", "verbosity", "completeness")
+        ]
+        print("✅ Evaluations complete!")
+        return results
+    except Exception as e:
+        print(f"❌ Evaluation failed: {e}")
+        return None
+
+
+def run_lower_level_evaluations(df):
+    """Runs LLM-based evaluations on lower-level (deep) analysis data."""
+    print("🧠 Running Lower-Level AI Evaluations...")
+    
+    model = _get_model()
+    if model is None:
+        print("⚠️ GEMINI_API_KEY not set. Skipping lower-level evaluations.")
+        return None
+
     evaluators = [
-        LLMEvaluator(model=model, template=detail_template),
-        LLMEvaluator(model=model, template=accuracy_template)
+        LLMEvaluator(model=model, template=DETAIL_TEMPLATE),
+        LLMEvaluator(model=model, template=ACCURACY_TEMPLATE)
     ]
 
     try:
-        results = run_evals(
-            dataframe=df,
-            evaluators=evaluators,
-            provide_explanation=True
-        )
+        results = _run_evaluators_concurrently(df, evaluators)
         print("✅ Lower-level evaluations complete!")
         return results
     except Exception as e:
@@ -286,10 +629,17 @@ def run_lower_level_evaluations(df):
 def main(args):
     capsules_path = args.capsules_path
     print("🚀 Starting Arize Phoenix for Nexhacks...")
+
+    # Artifact writes (results, stats, explanations) gate nothing downstream,
+    # so they run on a small pool and overlap the Phoenix launch; main waits
+    # on them before handing control to the user / exiting.
+    io_executor = ThreadPoolExecutor(max_workers=2)
+    io_futures = []
     
-    # 1. Load the data
+    # 1. Load the data (capsules.json is parsed once and shared by both loaders)
     print(f"📂 Loading data from {capsules_path}...")
-    df = load_data(capsules_path)
+    capsules_data = _read_capsules(capsules_path)
+    df = load_data(capsules_data)
     
     if df is not None and not df.empty:
         print(f"✅ Loaded {len(df)} records.")
@@ -301,61 +651,99 @@ def main(args):
         if eval_results is not None:
             print(f"🔗 Merging {len(eval_results)} evaluation result sets...")
             
+            result_dfs = []
+
             # 1. Clarity Results (Index 0)
             if len(eval_results) > 0:
                 clarity_df = eval_results[0]
-                clarity_df = clarity_df.rename(columns={
+                clarity_df.rename(columns={
                     "label": "clarity_score",
                     "explanation": "clarity_explanation",
                     "score": "clarity_numeric"
-                })
-                # Ensure score is numeric
-                clarity_df["clarity_score"] = pd.to_numeric(clarity_df["clarity_score"], errors='coerce')
-                clarity_df = clarity_df[["clarity_score", "clarity_explanation"]]
-                df = df.join(clarity_df)
+                }, inplace=True)
+                # Ensure score is numeric (downcast: 1-5 scale never needs float64)
+                clarity_df["clarity_score"] = pd.to_numeric(clarity_df["clarity_score"], errors='coerce', downcast='float')
+                result_dfs.append(clarity_df[["clarity_score", "clarity_explanation"]])
 
             # 2. Verbosity Results (Index 1)
             if len(eval_results) > 1:
                 verbosity_df = eval_results[1]
-                verbosity_df = verbosity_df.rename(columns={
+                verbosity_df.rename(columns={
                     "label": "verbosity_label",
                     "explanation": "verbosity_explanation",
                     "score": "verbosity_confidence"
-                })
-                # 1 = Good, 0 = Too Short/Too Long
-                verbosity_df["verbosity_is_good"] = verbosity_df["verbosity_label"].apply(
-                    lambda x: 1 if str(x).lower() == "good" else 0
+                }, inplace=True)
+                # 1 = Good, 0 = Too Short/Too Long (vectorized, 1-byte dtype)
+                verbosity_df["verbosity_is_good"] = (
+                    verbosity_df["verbosity_label"].astype("string").str.lower()
+                    .eq("good").fillna(False).astype("int8")
                 )
-                verbosity_df = verbosity_df[["verbosity_label", "verbosity_explanation", "verbosity_is_good"]]
-                df = df.join(verbosity_df)
+                result_dfs.append(verbosity_df[["verbosity_label", "verbosity_explanation", "verbosity_is_good"]])
 
             # 3. Completeness Results (Index 2)
             if len(eval_results) > 2:
                 completeness_df = eval_results[2]
-                completeness_df = completeness_df.rename(columns={
+                completeness_df.rename(columns={
                     "label": "completeness_score",
                     "explanation": "completeness_explanation",
                     "score": "completeness_numeric"
-                })
-                # Ensure score is numeric
-                completeness_df["completeness_score"] = pd.to_numeric(completeness_df["completeness_score"], errors='coerce')
-                completeness_df = completeness_df[["completeness_score", "completeness_explanation"]]
-                df = df.join(completeness_df)
+                }, inplace=True)
+                # Ensure score is numeric (downcast: 1-5 scale never needs float64)
+                completeness_df["completeness_score"] = pd.to_numeric(completeness_df["completeness_score"], errors='coerce', downcast='float')
+                result_dfs.append(completeness_df[["completeness_score", "completeness_explanation"]])
+
+            # All result frames share the base frame's index, so one concat
+            # stitches the columns on without the repeated index-aligned
+            # joins and intermediate full copies of df.
+            df = pd.concat([df, *result_dfs], axis=1, copy=False)
+
+            # The explanation texts arrive from run_evals as object dtype --
+            # one PyObject per cell. Rehome them in Arrow large_string buffers:
+            # roughly half the memory for these long strings, and the Parquet
+            # and Phoenix serialization paths become zero-copy.
+            for col in ("clarity_explanation", "verbosity_explanation", "completeness_explanation"):
+                if col in df.columns:
+                    df[col] = df[col].astype(pd.ArrowDtype(pa.large_string()))
+
+            # Persist each row's content hash alongside its scores. This is
+            # the same key the on-disk row cache uses, so diffing this column
+            # between runs shows exactly which rows were re-scored versus
+            # served from cache.
+            df["input_output_hash"] = pd.array(
+                [_fused_row_cache_key(row_input, row_output)
+                 for row_input, row_output in zip(df["input"], df["output"])],
+                dtype="string[pyarrow]",
+            )
+
+            # verbosity_label becomes a Phoenix tag later; categorize it here
+            # with the other dtype conversions so the frame is never mutated
+            # after it has been handed to the background writers.
+            if "verbosity_label" in df.columns:
+                df["verbosity_label"] = df["verbosity_label"].astype("category")
 
             # SAVE RAW RESULTS LOCALLY
-            output_csv = os.path.join(BASE_DIR, "evaluation_results.csv")
-            df.to_csv(output_csv, index=False)
-            print(f"💾 Saved raw results to {output_csv}")
+            # Parquet (zstd) is the primary artifact: typically 5-10x smaller
+            # than CSV and much faster for downstream jobs to re-open. The
+            # CSV copy is for humans and can be skipped with --no-csv.
+            output_parquet = os.path.join(BASE_DIR, "evaluation_results.parquet")
+            io_futures.append(io_executor.submit(
+                df.to_parquet, output_parquet, engine="pyarrow", compression="zstd", index=False))
+            print(f"💾 Writing raw results to {output_parquet}")
+            if not args.no_csv:
+                output_csv = os.path.join(BASE_DIR, "evaluation_results.csv")
+                io_futures.append(io_executor.submit(_write_csv, df, output_csv))
+                print(f"💾 Writing raw results to {output_csv}")
 
             # SAVE SUMMARY STATS (Aggregate Report)
             print("📊 Generating summary statistics...")
             stats = []
-            
-            # Numeric Columns
-            numeric_cols = ["clarity_score", "completeness_score", "verbosity_is_good"]
-            for col in numeric_cols:
-                if col in df.columns:
-                    desc = df[col].describe()
+
+            # Numeric Columns: one batched agg pass over all columns instead
+            # of a full describe() scan per column.
+            numeric_cols = [c for c in ("clarity_score", "completeness_score", "verbosity_is_good") if c in df.columns]
+            if numeric_cols:
+                num_stats = df[numeric_cols].agg(["count", "mean", "min", "max", "std"]).T
+                for col, desc in num_stats.iterrows():
                     stats.append({
                         "Feature": col,
                         "Type": "Numeric",
@@ -367,11 +755,11 @@ def main(args):
                         "Top/Unique": "N/A"
                     })
 
-            # Categorical Columns
-            cat_cols = ["verbosity_label", "language", "name"]
-            for col in cat_cols:
-                if col in df.columns:
-                    desc = df[col].astype(str).describe()
+            # Categorical Columns: likewise a single batched describe.
+            cat_cols = [c for c in ("verbosity_label", "language", "name") if c in df.columns]
+            if cat_cols:
+                cat_stats = df[cat_cols].astype("string").describe().T
+                for col, desc in cat_stats.iterrows():
                     stats.append({
                         "Feature": col,
                         "Type": "Categorical",
@@ -385,8 +773,8 @@ def main(args):
             
             stats_df = pd.DataFrame(stats)
             output_stats = os.path.join(BASE_DIR, "evaluation_stats.csv")
-            stats_df.to_csv(output_stats, index=False)
-            print(f"💾 Saved summary stats to {output_stats}")
+            io_futures.append(io_executor.submit(_write_csv, stats_df, output_stats))
+            print(f"💾 Writing summary stats to {output_stats}")
 
             # SAVE HISTORICAL TRACKING (Append-Only Log)
             # We want a flat structure: Timestamp, Clarity_Mean, Verbosity_Good_Rate, etc.
@@ -415,11 +803,7 @@ def main(args):
                  history_record["prompt_versions"] = ",".join(df["prompt_version"].unique())
             
             # Append to history CSV
-            history_df = pd.DataFrame([history_record])
-            if not os.path.exists(history_file):
-                history_df.to_csv(history_file, index=False)
-            else:
-                history_df.to_csv(history_file, mode='a', header=False, index=False)
+            _append_history_row(history_file, history_record)
             
             print(f"📈 Appended metrics to history log: {history_file}")
             
@@ -432,9 +816,17 @@ def main(args):
             if col in df.columns:
                 feature_cols.append(col)
         
-        for col in ["clarity_explanation", "verbosity_label", "verbosity_explanation", "completeness_explanation"]:
-            if col in df.columns:
-                tag_cols.append(col)
+        if "verbosity_label" in df.columns:
+            tag_cols.append("verbosity_label")
+
+        # Free-text explanations are high-cardinality strings that Phoenix
+        # would otherwise index as tags, ballooning the in-memory dataset.
+        # Park them in a side table keyed by id and keep Inferences lean.
+        explanation_cols = [c for c in ("clarity_explanation", "verbosity_explanation", "completeness_explanation") if c in df.columns]
+        if explanation_cols:
+            explanations_path = os.path.join(BASE_DIR, "explanations.parquet")
+            df[["id", *explanation_cols]].to_parquet(explanations_path, index=False)
+            print(f"💾 Saved explanation texts to {explanations_path}")
 
         schema = px.Schema(
             prediction_id_column_name="id",
@@ -443,13 +835,19 @@ def main(args):
             tag_column_names=tag_cols
         )
 
-        ds_upper = px.Inferences(dataframe=df, schema=schema, name="Upper-Level Summaries")
+        # Hand Phoenix only the columns the schema references: it copies and
+        # indexes the frame it receives, so a narrow projection is linearly
+        # cheaper than the full result frame. prompt_version is the last
+        # repetitive tag still stored as plain strings; categorize it here.
+        df_px = df[["id", "output", *feature_cols, *tag_cols]].copy()
+        df_px["prompt_version"] = df_px["prompt_version"].astype("category")
+        ds_upper = px.Inferences(dataframe=df_px, schema=schema, name="Upper-Level Summaries")
 
         # =====================================================
         # LOWER-LEVEL ANALYSIS PROCESSING
         # =====================================================
         print("\n📂 Loading lower-level analysis data...")
-        df_lower = load_lower_level_data(capsules_path)
+        df_lower = load_lower_level_data(capsules_data)
         ds_lower = None
         
         if df_lower is not None and not df_lower.empty:
@@ -461,32 +859,47 @@ def main(args):
             if lower_eval_results is not None:
                 print(f"🔗 Merging {len(lower_eval_results)} lower-level evaluation result sets...")
                 
+                result_dfs_lower = []
+
                 # 1. Detail Score Results (Index 0)
                 if len(lower_eval_results) > 0:
                     detail_df = lower_eval_results[0]
-                    detail_df = detail_df.rename(columns={
+                    detail_df.rename(columns={
                         "label": "detail_score",
                         "explanation": "detail_explanation",
-                    })
-                    detail_df["detail_score"] = pd.to_numeric(detail_df["detail_score"], errors='coerce')
-                    detail_df = detail_df[["detail_score", "detail_explanation"]]
-                    df_lower = df_lower.join(detail_df)
+                    }, inplace=True)
+                    detail_df["detail_score"] = pd.to_numeric(detail_df["detail_score"], errors='coerce', downcast='float')
+                    result_dfs_lower.append(detail_df[["detail_score", "detail_explanation"]])
 
                 # 2. Accuracy Score Results (Index 1)
                 if len(lower_eval_results) > 1:
                     accuracy_df = lower_eval_results[1]
-                    accuracy_df = accuracy_df.rename(columns={
+                    accuracy_df.rename(columns={
                         "label": "accuracy_score",
                         "explanation": "accuracy_explanation",
-                    })
-                    accuracy_df["accuracy_score"] = pd.to_numeric(accuracy_df["accuracy_score"], errors='coerce')
-                    accuracy_df = accuracy_df[["accuracy_score", "accuracy_explanation"]]
-                    df_lower = df_lower.join(accuracy_df)
+                    }, inplace=True)
+                    accuracy_df["accuracy_score"] = pd.to_numeric(accuracy_df["accuracy_score"], errors='coerce', downcast='float')
+                    result_dfs_lower.append(accuracy_df[["accuracy_score", "accuracy_explanation"]])
+
+                # Same single-concat stitch as the upper-level merge: the
+                # result frames share df_lower's index, so no per-frame
+                # index-aligned joins or intermediate copies.
+                df_lower = pd.concat([df_lower, *result_dfs_lower], axis=1, copy=False)
+
+                # Same Arrow large_string rehoming as the upper-level merge.
+                for col in ("detail_explanation", "accuracy_explanation"):
+                    if col in df_lower.columns:
+                        df_lower[col] = df_lower[col].astype(pd.ArrowDtype(pa.large_string()))
 
                 # Save lower-level results
-                output_csv_lower = os.path.join(BASE_DIR, "evaluation_results_lower.csv")
-                df_lower.to_csv(output_csv_lower, index=False)
-                print(f"💾 Saved lower-level results to {output_csv_lower}")
+                output_parquet_lower = os.path.join(BASE_DIR, "evaluation_results_lower.parquet")
+                io_futures.append(io_executor.submit(
+                    df_lower.to_parquet, output_parquet_lower, engine="pyarrow", compression="zstd", index=False))
+                print(f"💾 Writing lower-level results to {output_parquet_lower}")
+                if not args.no_csv:
+                    output_csv_lower = os.path.join(BASE_DIR, "evaluation_results_lower.csv")
+                    io_futures.append(io_executor.submit(_write_csv, df_lower, output_csv_lower))
+                    print(f"💾 Writing lower-level results to {output_csv_lower}")
 
                 # SAVE LOWER-LEVEL HISTORICAL TRACKING (Append-Only Log)
                 history_file_lower = os.path.join(BASE_DIR, "evaluation_history_lower.csv")
@@ -505,11 +918,7 @@ def main(args):
                     history_record_lower["accuracy_mean"] = round(df_lower["accuracy_score"].mean(), 2)
                 
                 # Append to history CSV
-                history_df_lower = pd.DataFrame([history_record_lower])
-                if not os.path.exists(history_file_lower):
-                    history_df_lower.to_csv(history_file_lower, index=False)
-                else:
-                    history_df_lower.to_csv(history_file_lower, mode='a', header=False, index=False)
+                _append_history_row(history_file_lower, history_record_lower)
                 
                 print(f"📈 Appended lower-level metrics to history log: {history_file_lower}")
 
@@ -521,9 +930,15 @@ def main(args):
                 if col in df_lower.columns:
                     feature_cols_lower.append(col)
             
-            for col in ["detail_explanation", "accuracy_explanation"]:
-                if col in df_lower.columns:
-                    tag_cols_lower.append(col)
+            df_lower = df_lower.astype({"language": "category", "name": "category"})
+
+            # Same treatment as the upper-level dataset: explanations go to a
+            # side table rather than high-cardinality Phoenix tags.
+            explanation_cols_lower = [c for c in ("detail_explanation", "accuracy_explanation") if c in df_lower.columns]
+            if explanation_cols_lower:
+                explanations_path_lower = os.path.join(BASE_DIR, "explanations_lower.parquet")
+                df_lower[["id", *explanation_cols_lower]].to_parquet(explanations_path_lower, index=False)
+                print(f"💾 Saved lower-level explanation texts to {explanations_path_lower}")
 
             schema_lower = px.Schema(
                 prediction_id_column_name="id",
@@ -531,7 +946,10 @@ def main(args):
                 feature_column_names=feature_cols_lower,
                 tag_column_names=tag_cols_lower
             )
-            ds_lower = px.Inferences(dataframe=df_lower, schema=schema_lower, name="Lower-Level Analyses")
+            # Same narrow projection as the upper-level dataset.
+            df_px_lower = df_lower[["id", "output", *feature_cols_lower, *tag_cols_lower]].copy()
+            df_px_lower["prompt_version"] = df_px_lower["prompt_version"].astype("category")
+            ds_lower = px.Inferences(dataframe=df_px_lower, schema=schema_lower, name="Lower-Level Analyses")
         else:
             print("⚠️ No lower-level analysis data found (run --deep-all first).")
 
@@ -544,10 +962,14 @@ def main(args):
             
             print("\n✨ Phoenix is running!")
             print(f"👉 Open the UI: {session.url}")
-            
+
+            # Settle the background writes before handing the session over
+            _settle_writes(io_futures)
+
             # Keep the script running
             input("\nPress Enter to stop the server...")
         else:
+            _settle_writes(io_futures)
             print("\n✅ Evaluations complete (headless mode - CSVs saved).")
     else:
         print("⚠️ No data found to inspect.")
@@ -562,6 +984,11 @@ def parse_args():
         action="store_true",
         help="Run evaluations and save CSVs without launching Phoenix UI"
     )
+    parser.add_argument(
+        "--no-csv",
+        action="store_true",
+        help="Skip the human-readable CSV copies of the results (Parquet is always written)"
+    )
     parser.add_argument(
         "--capsules-path",
         type=str,